@@ -12,5 +12,6 @@ from .postquantum import PQPublicKey, PQPrivateKey, PQEncapsulation
 from .handshake import Handshake
 from .encrypt import Encryptor
 from .decrypt import Decryptor
+from .archive import Archive, ArchiveReader
 from .revocation import RevocationManager
 from .utils import load_config, save_config, setup_logging, serialize_bytes, deserialize_bytes
@@ -0,0 +1,218 @@
+# File: qgp/archive.py
+"""
+Multi-file encryption for QGP: one hybrid handshake per batch, per-file keys derived
+from the shared key, parallel Zstd compression + SecretBox encryption, and a single
+archive with an encrypted, indexed manifest so any file can be extracted on its own.
+
+Archive layout:
+  MAGIC (4) | version (1) | recipient key ID (8) | sender key ID (8, zeros if hidden)
+  | PQ ciphertext length (2) | PQ ciphertext
+  | file blobs (nonce || ciphertext) ...
+  | manifest blob (nonce || ciphertext)
+  | manifest offset (8) | manifest length (8)
+"""
+import os
+import json
+import struct
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import zstd
+from nacl.secret import SecretBox
+from nacl.hash import blake2b
+from nacl.encoding import RawEncoder
+from nacl.utils import random as random_bytes
+from qgp.handshake import Handshake
+from qgp.keys import KEY_ID_SIZE
+
+MAGIC = b"QGPA"
+VERSION = 1
+FOOTER = struct.Struct(">QQ")
+
+def _derive_key(shared_key: bytes, person: bytes, index: int = 0) -> bytes:
+    """Derive a 32-byte subkey from the batch shared key via keyed BLAKE2b."""
+    return blake2b(index.to_bytes(8, 'big'), key=shared_key, encoder=RawEncoder,
+                   digest_size=32, person=person)
+
+def _seal(key: bytes, data: bytes) -> bytes:
+    nonce = random_bytes(SecretBox.NONCE_SIZE)
+    return nonce + SecretBox(key).encrypt(zstd.compress(data), nonce).ciphertext
+
+def _open(key: bytes, blob: bytes) -> bytes:
+    return zstd.decompress(SecretBox(key).decrypt(blob))
+
+def collect_files(sources: list, exclude: str = None) -> list:
+    """
+    Expand files and directories into sorted (archive name, path) pairs.
+    As with tar, files inside a directory are named under the directory's own
+    name (`a/x.txt`); bare files keep their basename. `exclude` is skipped
+    inside directories, so an archive written there does not read itself.
+    Raises FileNotFoundError for missing sources and ValueError when two
+    sources map to the same archive name, when `exclude` is itself a source,
+    or for the filesystem root.
+    """
+    missing = [str(src) for src in sources if not os.path.exists(src)]
+    if missing:
+        raise FileNotFoundError(f"No such file or directory: {', '.join(missing)}")
+    skip = os.path.realpath(exclude) if exclude else None
+    if skip and any(os.path.realpath(src) == skip for src in sources):
+        raise ValueError(f"Output {exclude} is also a source")
+    entries = []
+    for src in sources:
+        if os.path.isdir(src):
+            prefix = os.path.basename(os.path.abspath(src))
+            if not prefix:
+                raise ValueError(f"Cannot archive the filesystem root: {src}")
+            for dirpath, _, filenames in os.walk(src):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(path, src).replace(os.sep, '/')
+                    entries.append((f"{prefix}/{rel}", path))
+        else:
+            entries.append((os.path.basename(src), src))
+    entries = sorted(e for e in entries if os.path.realpath(e[1]) != skip)
+    counts = Counter(name for name, _ in entries)
+    duplicates = sorted(name for name, n in counts.items() if n > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate archive names: {', '.join(duplicates)}")
+    return entries
+
+class Archive:
+    @staticmethod
+    def pack(sender_ecc_sk, receiver_ecc_pk, receiver_pq_pk, sources: list, out_path: str,
+             recipient_id: bytes = None, sender_id: bytes = None, workers: int = None) -> int:
+        """
+        Encrypt files and directories into a single archive with one handshake:
+          - Hybrid handshake to the receiver
+          - Per-file keys = BLAKE2b(index, key=shared_key)
+          - Compress and encrypt files in parallel across a thread pool
+          - Append an encrypted manifest of names, offsets and sizes
+        Returns the number of files written. Sources are checked before out_path
+        is touched (see collect_files); a failed write removes out_path.
+        """
+        entries = collect_files(sources, exclude=out_path)
+        hs = Handshake.initiate(sender_ecc_sk, receiver_ecc_pk, receiver_pq_pk)
+        shared = hs['shared_key']
+        ct_pq = hs['ciphertext_pq']
+
+        def _encrypt(item):
+            index, (_, path) = item
+            with open(path, 'rb') as f:
+                data = f.read()
+            return len(data), _seal(_derive_key(shared, b"qgp-file", index), data)
+
+        workers = workers or os.cpu_count() or 1
+        manifest = []
+        try:
+            with open(out_path, 'wb') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+                out.write(MAGIC + bytes([VERSION]))
+                out.write(recipient_id or bytes(KEY_ID_SIZE))
+                out.write(sender_id or bytes(KEY_ID_SIZE))
+                out.write(struct.pack(">H", len(ct_pq)) + ct_pq)
+                # Bound in-flight work so large batches do not sit in memory at once
+                window = workers * 4
+                items = list(enumerate(entries))
+                for start in range(0, len(items), window):
+                    batch = items[start:start + window]
+                    for (_, (name, _)), (size, blob) in zip(batch, pool.map(_encrypt, batch)):
+                        manifest.append({'name': name, 'offset': out.tell(),
+                                         'length': len(blob), 'size': size})
+                        out.write(blob)
+                manifest_offset = out.tell()
+                manifest_blob = _seal(_derive_key(shared, b"qgp-manifest"),
+                                      json.dumps({'files': manifest}).encode())
+                out.write(manifest_blob)
+                out.write(FOOTER.pack(manifest_offset, len(manifest_blob)))
+        except BaseException:
+            # Never leave a half-written archive behind
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            raise
+        return len(manifest)
+
+    @staticmethod
+    def read_header(archive_path: str) -> dict:
+        """
+        Read the plaintext archive header.
+        Returns dict with:
+          'recipient_id': bytes,
+          'sender_id': bytes or None if hidden,
+          'ciphertext_pq': bytes
+        """
+        with open(archive_path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{archive_path} is not a QGP archive")
+            version = f.read(1)
+            if version != bytes([VERSION]):
+                raise ValueError(f"Unsupported archive version {version.hex() or 'missing'}")
+            recipient_id = f.read(KEY_ID_SIZE)
+            sender_id = f.read(KEY_ID_SIZE)
+            ct_len = f.read(2)
+            ct_pq = f.read(int.from_bytes(ct_len, 'big'))
+            if len(sender_id) != KEY_ID_SIZE or len(ct_len) != 2 or not ct_pq:
+                raise ValueError(f"{archive_path} is truncated")
+        return {
+            'recipient_id': recipient_id,
+            'sender_id': sender_id if any(sender_id) else None,
+            'ciphertext_pq': ct_pq
+        }
+
+    @staticmethod
+    def open(receiver_ecc_sk, sender_ecc_pk, receiver_pq_sk, archive_path: str) -> 'ArchiveReader':
+        """
+        Recover the batch shared key with one handshake and return a reader
+        over the decrypted manifest.
+        """
+        header = Archive.read_header(archive_path)
+        shared = Handshake.respond(receiver_ecc_sk, sender_ecc_pk, receiver_pq_sk,
+                                   header['ciphertext_pq'])
+        return ArchiveReader(archive_path, shared)
+
+class ArchiveReader:
+    """Random-access reader over an archive whose shared key is known."""
+    def __init__(self, archive_path: str, shared_key: bytes):
+        self.archive_path = archive_path
+        self.shared_key = shared_key
+        with open(archive_path, 'rb') as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            offset, length = FOOTER.unpack(f.read(FOOTER.size))
+            f.seek(offset)
+            manifest = json.loads(_open(_derive_key(shared_key, b"qgp-manifest"), f.read(length)))
+        self.files = manifest['files']
+        # Name -> manifest index
+        self.index = {entry['name']: i for i, entry in enumerate(self.files)}
+
+    def names(self) -> list:
+        return [entry['name'] for entry in self.files]
+
+    def read(self, name: str) -> bytes:
+        """Decrypt a single file without touching the rest of the archive."""
+        if name not in self.index:
+            raise KeyError(f"No entry '{name}' in {self.archive_path}")
+        i = self.index[name]
+        entry = self.files[i]
+        with open(self.archive_path, 'rb') as f:
+            f.seek(entry['offset'])
+            blob = f.read(entry['length'])
+        return _open(_derive_key(self.shared_key, b"qgp-file", i), blob)
+
+    def extract(self, out_dir: str, names: list = None, workers: int = None) -> int:
+        """
+        Decrypt files (all, or only `names`) into out_dir in parallel.
+        Returns the number of files written.
+        """
+        root = os.path.abspath(out_dir)
+
+        def _extract(name):
+            dest = os.path.abspath(os.path.join(root, name))
+            if os.path.commonpath([root, dest]) != root:
+                raise ValueError(f"Refusing to extract outside {out_dir}: {name}")
+            data = self.read(name)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with open(dest, 'wb') as f:
+                f.write(data)
+
+        names = self.names() if names is None else names
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            for _ in pool.map(_extract, names):
+                pass
+        return len(names)
@@ -6,12 +6,14 @@ Supports key management, hybrid handshake, encryption/decryption, and revocation
 import argparse
 import sys
 import binascii
+from nacl.exceptions import CryptoError
 
 from qgp.keys import KeyManager
 from qgp.postquantum import PQPublicKey
 from qgp.handshake import Handshake
 from qgp.encrypt import Encryptor
 from qgp.decrypt import Decryptor
+from qgp.archive import Archive
 
 # Helper to convert hex to bytes
 def hex2bytes(s: str) -> bytes:
@@ -22,6 +24,18 @@ def hex2bytes(s: str) -> bytes:
         sys.exit(1)
 
 
+# Helper to map a key ID hint to a stored key label
+def resolve_label(km: KeyManager, kid_hex: str, role: str, flag: str) -> str:
+    if not kid_hex:
+        print(f"Missing {role} key: pass {flag} or --{role}-id.")
+        sys.exit(1)
+    label = km.find_label(hex2bytes(kid_hex), private=(role == "recipient"))
+    if label is None:
+        print(f"No stored key matches {role} key ID {kid_hex}.")
+        sys.exit(1)
+    return label
+
+
 def main():
     parser = argparse.ArgumentParser(prog="qgp", description="Quantum Good Privacy CLI")
     sub = parser.add_subparsers(dest="cmd")
@@ -37,15 +51,26 @@ def main():
     snd = sub.add_parser("send", help="Encrypt and output message payload for a peer")
     snd.add_argument("--sender", default="default", help="Your key label to send from")
     snd.add_argument("--to", required=True, help="Peer key label to send to")
-    snd.add_argument("--msg", required=True, help="Message text to send")
+    payload = snd.add_mutually_exclusive_group(required=True)
+    payload.add_argument("--msg", help="Message text to send")
+    payload.add_argument("--dir", nargs="+", help="Files or directories to encrypt into one archive")
+    snd.add_argument("--out", default="qgp.archive", help="Archive path written with --dir")
+    snd.add_argument("--workers", type=int, help="Worker threads for --dir (default: CPU count)")
+    snd.add_argument("--hide-sender", action="store_true", help="Omit the sender key ID from the payload")
 
     # receive
     rcv = sub.add_parser("receive", help="Decrypt incoming payload from a peer")
-    rcv.add_argument("--sender", default="default", help="Your key label to receive with")
-    rcv.add_argument("--from", dest="frm", required=True, help="Peer key label that sent the message")
-    rcv.add_argument("--pqct", required=True, help="PQ KEM ciphertext hex string")
-    rcv.add_argument("--nonce", required=True, help="Nonce hex string for symmetric decrypt")
-    rcv.add_argument("--ciphertext", required=True, help="Symmetric ciphertext hex string")
+    rcv.add_argument("--sender", help="Your key label to receive with (default: resolved from --recipient-id, else 'default')")
+    rcv.add_argument("--from", dest="frm", help="Peer key label that sent the message (default: resolved from --sender-id)")
+    rcv.add_argument("--recipient-id", help="Recipient key ID hex string")
+    rcv.add_argument("--sender-id", help="Sender key ID hex string")
+    rcv.add_argument("--pqct", help="PQ KEM ciphertext hex string")
+    rcv.add_argument("--nonce", help="Nonce hex string for symmetric decrypt")
+    rcv.add_argument("--ciphertext", help="Symmetric ciphertext hex string")
+    rcv.add_argument("--archive", help="Archive written by 'qgp send --dir'")
+    rcv.add_argument("--dir", help="Output directory for files extracted from --archive")
+    rcv.add_argument("--file", action="append", help="Extract only this archive entry (repeatable)")
+    rcv.add_argument("--workers", type=int, help="Worker threads for --archive (default: CPU count)")
 
     # revoke
     rv = sub.add_parser("revoke", help="Publish a key revocation")
@@ -53,7 +78,16 @@ def main():
     rv.add_argument("--reason", help="Optional reason for revocation")
 
     # subscribe
-    sub.add_parser("subscribe", help="Listen for revocation notices")
+    sb = sub.add_parser("subscribe", help="Listen for revocation notices")
+    sb.add_argument("--pointer", help="Snapshot pointer CID to bootstrap from before listening")
+    sb.add_argument("--trust", action="append", help="Hex verify key accepted for snapshots (repeatable)")
+
+    # revocation snapshots
+    rvc = sub.add_parser("revocation", help="Manage revocation snapshots")
+    rvc_sub = rvc.add_subparsers(dest="revocation_cmd")
+    cpt = rvc_sub.add_parser("compact", help="Publish a signed snapshot/delta of known revocations")
+    cpt.add_argument("--sender", default="default", help="Your key label to sign the snapshot with")
+    cpt.add_argument("--full", action="store_true", help="Force a full snapshot instead of a delta")
 
     args = parser.parse_args()
     km = KeyManager()
@@ -75,6 +109,24 @@ def main():
         else:
             print("No keypairs found. Generate one with 'qgp keygen'.")
 
+    elif args.cmd == "send" and args.dir:
+        # One handshake for the whole batch, files encrypted in parallel
+        try:
+            count = Archive.pack(
+                km.load_ecc_private(args.sender),
+                km.load_ecc_public(args.to),
+                km.load_pq_public(args.to),
+                args.dir,
+                args.out,
+                recipient_id=km.key_id(args.to),
+                sender_id=None if args.hide_sender else km.key_id(args.sender),
+                workers=args.workers
+            )
+        except (FileNotFoundError, ValueError) as exc:
+            print(exc)
+            sys.exit(1)
+        print(f"✔ Encrypted {count} files into '{args.out}'")
+
     elif args.cmd == "send":
         # Load sender keys
         sk_ecc = km.load_ecc_private(args.sender)
@@ -88,16 +140,54 @@ def main():
         # Symmetric encryption
         enc = Encryptor.encrypt(shared, args.msg.encode())
         # Output payloads
+        print("# Recipient key ID (hex):", km.key_id(args.to).hex())
+        if not args.hide_sender:
+            print("# Sender key ID (hex):", km.key_id(args.sender).hex())
         print("# PQ KEM ciphertext (hex):", ct_pq.hex())
         print("# Nonce (hex):", enc['nonce'].hex())
         print("# Ciphertext (hex):", enc['ciphertext'].hex())
 
+    elif args.cmd == "receive" and args.archive:
+        # Key ID hints come from the archive header unless given explicitly
+        try:
+            header = Archive.read_header(args.archive)
+        except (OSError, ValueError) as exc:
+            print(f"Cannot read archive: {exc}")
+            sys.exit(1)
+        recipient_id = args.recipient_id or header['recipient_id'].hex()
+        sender_id = args.sender_id or (header['sender_id'].hex() if header['sender_id'] else None)
+        receiver = args.sender or resolve_label(km, recipient_id, "recipient", "--sender")
+        peer = args.frm or resolve_label(km, sender_id, "sender", "--from")
+        sk_ecc = km.load_ecc_private(receiver)
+        pq_sk = km.load_pq_private(receiver)
+        pk_ecc = km.load_ecc_public(peer)
+        try:
+            reader = Archive.open(sk_ecc, pk_ecc, pq_sk, args.archive)
+        except CryptoError:
+            print("Cannot decrypt archive: wrong keys or corrupted data.")
+            sys.exit(1)
+        except (OSError, ValueError) as exc:
+            print(f"Cannot read archive: {exc}")
+            sys.exit(1)
+        unknown = [name for name in args.file or [] if name not in reader.index]
+        if unknown:
+            print(f"Not in archive: {', '.join(unknown)}")
+            sys.exit(1)
+        count = reader.extract(args.dir or ".", names=args.file, workers=args.workers)
+        print(f"✔ Extracted {count} files into '{args.dir or '.'}'")
+
     elif args.cmd == "receive":
+        if not (args.pqct and args.nonce and args.ciphertext):
+            parser.error("receive requires --pqct, --nonce and --ciphertext, or --archive")
+        # Resolve labels from key ID hints when not given explicitly
+        receiver = args.sender or (resolve_label(km, args.recipient_id, "recipient", "--sender")
+                                   if args.recipient_id else "default")
+        peer = args.frm or resolve_label(km, args.sender_id, "sender", "--from")
         # Load receiver (your) keys
-        sk_ecc = km.load_ecc_private(args.sender)
-        pq_sk = km.load_pq_private(args.sender)
+        sk_ecc = km.load_ecc_private(receiver)
+        pq_sk = km.load_pq_private(receiver)
         # Load sender public key
-        pk_ecc = km.load_ecc_public(args.frm)
+        pk_ecc = km.load_ecc_public(peer)
         # Hybrid respond: use PQ ciphertext
         shared = Handshake.respond(
             sk_ecc,
@@ -125,14 +215,25 @@ def main():
         print("Listening for revocations. Press Ctrl+C to stop.")
         def callback(rec):
             print(f"Revocation notice: {rec}")
+        def on_error(cid, exc):
+            print(f"Bootstrap from pointer {cid} failed: {exc}")
         try:
-            rm.subscribe_revocations(callback)
+            rm.subscribe_revocations(callback, pointer_cid=args.pointer,
+                                     trusted_signers=args.trust, on_error=on_error)
             import time
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
             print("Stopped listening.")
 
+    elif args.cmd == "revocation" and args.revocation_cmd == "compact":
+        from qgp.revocation import RevocationManager
+        rm = RevocationManager()
+        signing_key = km.load_signing_key(args.sender)
+        cid = rm.compact_revocations(signing_key, full=args.full)
+        print(f"Published revocation snapshot pointer CID: {cid}")
+        print(f"  Signer verify key: {signing_key.verify_key.encode().hex()}")
+
     else:
         parser.print_help()
 
@@ -5,6 +5,8 @@ storage, listing, and loading.
 """
 import os
 from nacl.public import PrivateKey, PublicKey
+from nacl.signing import SigningKey
+from nacl.hash import blake2b
 from nacl.encoding import RawEncoder
 from qgp.postquantum import (
     generate_pq_keypair,
@@ -16,9 +18,22 @@ from qgp.postquantum import (
 KEY_DIR = os.path.expanduser("~/.qgp/keys")
 os.makedirs(KEY_DIR, exist_ok=True)
 
+# Length in bytes of key IDs carried in payloads as recipient/sender hints
+KEY_ID_SIZE = 8
+
+def _derive_key_id(ecc_pk, pq_pk) -> bytes:
+    """
+    Derive a short key ID from a hybrid public key: BLAKE2b(ecc_pk || pq_pk).
+    Lets a receiver pick the right identity without trial decryption.
+    """
+    data = ecc_pk.encode(encoder=RawEncoder) + pq_pk.to_bytes()
+    return blake2b(data, encoder=RawEncoder, digest_size=KEY_ID_SIZE, person=b"qgp-keyid")
+
 class KeyManager:
     def __init__(self, key_dir=KEY_DIR):
         self.key_dir = key_dir
+        # In-memory key ID -> labels index, built lazily by find_label
+        self._key_index = None
 
     def generate_keypair(self, label="default"):
         """
@@ -49,6 +64,11 @@ class KeyManager:
         with open(os.path.join(self.key_dir, f"{label}_pq.pk"), "wb") as f:
             f.write(pq_pk.to_bytes())
 
+        if self._key_index is not None:
+            labels = self._key_index.setdefault(_derive_key_id(ecc_pk, pq_pk), [])
+            if label not in labels:
+                labels.append(label)
+
         return ecc_sk, ecc_pk, pq_sk, pq_pk
 
     def list_labels(self):
@@ -62,6 +82,47 @@ class KeyManager:
                 labels.add(filename.rsplit('_ecc.sk', 1)[0])
         return sorted(labels)
 
+    def key_id(self, label="default"):
+        """
+        Return the key ID of the public keys stored under `label`.
+        """
+        return _derive_key_id(self.load_ecc_public(label), self.load_pq_public(label))
+
+    def has_private(self, label="default"):
+        """
+        Return True if both ECC and PQ private keys are stored under `label`.
+        """
+        return all(os.path.exists(os.path.join(self.key_dir, f"{label}_{kind}.sk"))
+                   for kind in ("ecc", "pq"))
+
+    def build_key_index(self):
+        """
+        Rebuild the in-memory key ID -> labels index from every label that has
+        both ECC and PQ public keys (own identities and known peers).
+        A key stored under several labels maps to all of them, sorted.
+        """
+        index = {}
+        for filename in sorted(os.listdir(self.key_dir)):
+            if filename.endswith('_ecc.pk'):
+                label = filename.rsplit('_ecc.pk', 1)[0]
+                if os.path.exists(os.path.join(self.key_dir, f"{label}_pq.pk")):
+                    index.setdefault(self.key_id(label), []).append(label)
+        self._key_index = index
+        return index
+
+    def find_label(self, kid: bytes, private=False):
+        """
+        Look up a label for a key ID. With `private=True`, only labels holding
+        the private keys are considered (use for the recipient role).
+        Returns None if no stored key matches.
+        """
+        if self._key_index is None:
+            self.build_key_index()
+        for label in self._key_index.get(kid, []):
+            if not private or self.has_private(label):
+                return label
+        return None
+
     def load_ecc_private(self, label="default"):
         path = os.path.join(self.key_dir, f"{label}_ecc.sk")
         data = open(path, 'rb').read()
@@ -81,3 +142,13 @@ class KeyManager:
         path = os.path.join(self.key_dir, f"{label}_pq.pk")
         data = open(path, 'rb').read()
         return PQPublicKey.from_bytes(data)
+
+    def load_signing_key(self, label="default"):
+        """
+        Derive an Ed25519 signing key from the ECC private key of `label`.
+        Used to sign revocation snapshots without storing an extra key file.
+        """
+        ecc_sk = self.load_ecc_private(label)
+        seed = blake2b(ecc_sk.encode(encoder=RawEncoder), encoder=RawEncoder,
+                       digest_size=32, person=b"qgp-sign")
+        return SigningKey(seed)
@@ -1,25 +1,130 @@
 # File: qgp/revocation.py
 """
 Decentralized revocation manager for QGP using IPFS PubSub.
-Publishes and listens for revocation records via IPFS.
+Publishes and listens for revocation records via IPFS, and compacts known
+records into signed, Zstd-compressed snapshots so new subscribers can
+bootstrap from one snapshot plus a few deltas instead of replaying every CID.
 """
+import os
 import json
+import logging
 import threading
+from contextlib import contextmanager
 from datetime import datetime
+from pathlib import Path
 import ipfshttpclient
+import zstd
+from nacl.signing import VerifyKey
+from qgp.utils import CONFIG_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 # Default PubSub topic
 TOPIC = "qgp-revocations"
 
+# Marker for pointer records announced on the topic after a compaction
+POINTER_TYPE = "qgp-revocation-pointer"
+
+# Local snapshot chain state; known records are appended to a sibling .jsonl log
+STATE_FILE = CONFIG_DIR / "revocations.json"
+
+# Number of deltas chained to a snapshot before the next compaction rebuilds it
+MAX_DELTAS = 16
+
 class RevocationManager:
-    def __init__(self, ipfs_addr: str = None):
+    def __init__(self, ipfs_addr: str = None, state_file=STATE_FILE):
         """
         Initialize IPFS client. Requires a local IPFS daemon.
         :param ipfs_addr: API address, e.g. '/ip4/127.0.0.1/tcp/5001'
+        :param state_file: path of the local snapshot chain state; known records
+                           are kept in an append-only log next to it (.jsonl)
         """
         addr = ipfs_addr or "/ip4/127.0.0.1/tcp/5001"
         self.client = ipfshttpclient.connect(addr)
         self.topic = TOPIC
+        self.state_file = Path(state_file)
+        self.log_file = self.state_file.with_suffix('.jsonl')
+        self.lock_file = self.state_file.with_suffix('.lock')
+        self._lock = threading.Lock()
+        # In-memory index of the record log (CID -> record, in log order)
+        self._records = {}
+        self._log_offset = 0
+
+    @contextmanager
+    def _locked(self):
+        """
+        Serialize state access across threads and, where fcntl exists, across
+        processes (e.g. `qgp subscribe` and `qgp revocation compact`).
+        """
+        with self._lock, open(self.lock_file, 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Read log lines appended since the last refresh (by any process) into the
+        in-memory index. Incomplete trailing lines are left for the next call.
+        """
+        if not self.log_file.exists():
+            return
+        with open(self.log_file, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                self._records.setdefault(entry['cid'], entry['record'])
+            except (ValueError, KeyError) as exc:
+                logger.warning("Skipping corrupt line in %s: %s", self.log_file, exc)
+        self._log_offset += end
+
+    def _load_state(self) -> dict:
+        state = {'snapshot': None, 'deltas': [], 'compacted': 0, 'pointer': None}
+        if self.state_file.exists():
+            with open(self.state_file, 'r') as f:
+                state.update(json.load(f))
+        return state
+
+    def _save_state(self, state: dict):
+        # Write a temp file and swap it in, so readers never see a partial file
+        tmp = self.state_file.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def _remember(self, records: dict, pointer: str = None) -> list:
+        """
+        Add records (CID -> record) to the local index and append them to the log.
+        Returns the CIDs that were not known before.
+        """
+        with self._locked():
+            self._refresh()
+            new = [cid for cid in records if cid not in self._records]
+            if new:
+                lines = ''.join(json.dumps({'cid': cid, 'record': records[cid]}) + '\n'
+                                for cid in new)
+                with open(self.log_file, 'a') as f:
+                    f.write(lines)
+                # Consumed via _refresh so the offset stays in step with the file
+                self._refresh()
+            if pointer:
+                state = self._load_state()
+                state['pointer'] = pointer
+                self._save_state(state)
+            return new
 
     def publish_revocation(self, key_fingerprint: str, reason: str = None) -> str:
         """
@@ -35,25 +140,73 @@ class RevocationManager:
         }
         # Add record to IPFS
         cid = self.client.add_json(record)
+        self._remember({cid: record})
         # Broadcast CID on PubSub
         self.client.pubsub.publish(self.topic, cid)
         return cid
 
-    def subscribe_revocations(self, callback, stop_event: threading.Event = None):
+    def subscribe_revocations(self, callback, stop_event: threading.Event = None,
+                              pointer_cid: str = None, trusted_signers: list = None,
+                              on_error=None):
         """
         Subscribe to the revocation topic and invoke callback for each record.
+        Before switching to live PubSub, bootstraps from the given pointer (or the
+        last trusted pointer saved locally). Pointers announced later on the topic
+        are used to catch up until one from a trusted signer has been applied;
+        without trusted_signers every valid pointer is merged.
         :param callback: function accepting a record dict
         :param stop_event: threading.Event to signal termination
+        :param pointer_cid: CID of a snapshot pointer record to bootstrap from
+        :param trusted_signers: optional list of hex verify keys accepted for snapshots
+        :param on_error: optional function accepting (CID, exception) for failed
+                         catch-ups, unreadable messages and local state errors;
+                         defaults to logging a warning
         """
+        def _catch_up(cid):
+            try:
+                records = self.bootstrap_revocations(cid, trusted_signers)
+            except Exception as exc:
+                _report(cid, exc)
+                return False
+            for rec in records:
+                callback(rec)
+            # Only a pointer checked against trusted signers ends the catch-up phase
+            return trusted_signers is not None
+
+        def _report(cid, exc):
+            if on_error:
+                on_error(cid, exc)
+            else:
+                logger.warning("Revocation %s: %s", cid, exc)
+
         def _listen():
             sub = self.client.pubsub.subscribe(self.topic)
+            start = pointer_cid
+            if not start:
+                try:
+                    start = self._load_state()['pointer']
+                except Exception as exc:
+                    _report(None, exc)
+            bootstrapped = bool(start) and _catch_up(start)
             for msg in sub:
+                cid = None
                 try:
                     cid = msg['data'].decode()
                     record = self.client.get_json(cid)
-                    callback(record)
-                except Exception:
-                    continue
+                    if record.get('type') == POINTER_TYPE:
+                        if not bootstrapped:
+                            bootstrapped = _catch_up(cid)
+                    else:
+                        try:
+                            new = self._remember({cid: record})
+                        except Exception as exc:
+                            # A broken local index must not hide live revocations
+                            _report(cid, exc)
+                            new = True
+                        if new:
+                            callback(record)
+                except Exception as exc:
+                    _report(cid, exc)
                 if stop_event and stop_event.is_set():
                     break
         thread = threading.Thread(target=_listen, daemon=True)
@@ -74,3 +227,145 @@ class RevocationManager:
             except Exception:
                 continue
         return records
+
+    def _put_signed(self, body: dict, signing_key) -> str:
+        """
+        Store a signed, Zstd-compressed JSON body on IPFS.
+        Layout: verify_key (32 bytes) || signature (64 bytes) || zstd(json(body))
+        """
+        compressed = zstd.compress(json.dumps(body, sort_keys=True).encode())
+        signed = signing_key.sign(compressed)
+        return self.client.add_bytes(signing_key.verify_key.encode() + bytes(signed))
+
+    def _get_signed(self, cid: str, trusted_signers: list = None) -> tuple:
+        """
+        Fetch and verify a body stored by _put_signed.
+        Returns (body dict, signer hex). Raises ValueError for untrusted signers
+        and nacl.exceptions.BadSignatureError for forged data.
+        """
+        blob = self.client.cat(cid)
+        signer = blob[:32].hex()
+        if trusted_signers is not None and signer not in trusted_signers:
+            raise ValueError(f"Snapshot {cid} signed by untrusted key {signer}")
+        compressed = VerifyKey(blob[:32]).verify(blob[32:])
+        return json.loads(zstd.decompress(compressed)), signer
+
+    @staticmethod
+    def _sign_pointer(pointer: dict, signing_key) -> dict:
+        """
+        Sign the canonical JSON of a pointer record and embed signer and signature.
+        """
+        payload = json.dumps(pointer, sort_keys=True).encode()
+        signature = signing_key.sign(payload).signature
+        return dict(pointer, signer=signing_key.verify_key.encode().hex(), signature=signature.hex())
+
+    @staticmethod
+    def _verify_pointer(pointer: dict, trusted_signers: list = None) -> str:
+        """
+        Verify a pointer record signed by _sign_pointer.
+        Returns the signer hex. Raises ValueError for untrusted signers and
+        nacl.exceptions.BadSignatureError for forged pointers.
+        """
+        body = dict(pointer)
+        signer = body.pop('signer', '')
+        signature = body.pop('signature', '')
+        if not signer or not signature:
+            raise ValueError("Pointer is not signed")
+        if trusted_signers is not None and signer not in trusted_signers:
+            raise ValueError(f"Pointer signed by untrusted key {signer}")
+        payload = json.dumps(body, sort_keys=True).encode()
+        VerifyKey(bytes.fromhex(signer)).verify(payload, bytes.fromhex(signature))
+        return signer
+
+    def compact_revocations(self, signing_key, full: bool = False) -> str:
+        """
+        Publish a signed snapshot of all known revocations, or a delta chained
+        to the current snapshot holding only records added since the last
+        compaction, then announce a signed pointer record on the topic.
+        A full snapshot is rebuilt when requested, when none exists yet, or once
+        MAX_DELTAS deltas have accumulated. If there is nothing new to compact,
+        the current pointer is returned without publishing anything.
+        :param signing_key: nacl.signing.SigningKey used to sign snapshots and pointers
+        :param full: force a full snapshot
+        :return: CID of the current pointer record
+        """
+        with self._locked():
+            self._refresh()
+            state = self._load_state()
+            timestamp = datetime.utcnow().isoformat() + 'Z'
+            # The log is append-only, so the first `compacted` entries are covered
+            if full or not state['snapshot'] or len(state['deltas']) >= MAX_DELTAS:
+                records = [dict(rec, cid=cid) for cid, rec in self._records.items()]
+                body = {'kind': 'snapshot', 'records': records, 'timestamp': timestamp}
+                state['snapshot'] = self._put_signed(body, signing_key)
+                state['deltas'] = []
+                state['compacted'] = len(records)
+            else:
+                new = list(self._records.items())[state['compacted']:]
+                if not new and state['pointer']:
+                    return state['pointer']
+                if new:
+                    records = [dict(rec, cid=cid) for cid, rec in new]
+                    body = {
+                        'kind': 'delta',
+                        'base': state['snapshot'],
+                        'prev': state['deltas'][-1] if state['deltas'] else state['snapshot'],
+                        'records': records,
+                        'timestamp': timestamp
+                    }
+                    state['deltas'].append(self._put_signed(body, signing_key))
+                    state['compacted'] += len(new)
+
+            pointer = self._sign_pointer({
+                'type': POINTER_TYPE,
+                'snapshot': state['snapshot'],
+                'deltas': state['deltas'],
+                'head': state['deltas'][-1] if state['deltas'] else state['snapshot'],
+                'count': state['compacted'],
+                'timestamp': timestamp
+            }, signing_key)
+            pointer_cid = self.client.add_json(pointer)
+            state['pointer'] = pointer_cid
+            self._save_state(state)
+        self.client.pubsub.publish(self.topic, pointer_cid)
+        return pointer_cid
+
+    def bootstrap_revocations(self, pointer_cid: str, trusted_signers: list = None) -> list:
+        """
+        Rebuild the revocation set from a pointer record: verify the pointer
+        signature, fetch its snapshot and deltas, check they are signed by the same
+        key, that the chain ends at the signed head and that the record count
+        matches, then merge the records into the local index. The pointer is saved
+        for later restarts only when its signer was checked against trusted_signers.
+        :param pointer_cid: CID of a pointer record announced by compact_revocations
+        :param trusted_signers: optional list of hex verify keys accepted for snapshots
+        :return: list of record dicts not previously known locally
+        """
+        pointer = self.client.get_json(pointer_cid)
+        if pointer.get('type') != POINTER_TYPE:
+            raise ValueError(f"{pointer_cid} is not a revocation pointer")
+        signer = self._verify_pointer(pointer, trusted_signers)
+
+        body, _ = self._get_signed(pointer['snapshot'], [signer])
+        if body.get('kind') != 'snapshot':
+            raise ValueError(f"{pointer['snapshot']} is not a revocation snapshot")
+        records = body['records']
+        prev = pointer['snapshot']
+        for delta_cid in pointer['deltas']:
+            delta, _ = self._get_signed(delta_cid, [signer])
+            if delta.get('kind') != 'delta' or delta.get('base') != pointer['snapshot'] \
+                    or delta.get('prev') != prev:
+                raise ValueError(f"Delta {delta_cid} does not chain from {prev}")
+            records.extend(delta['records'])
+            prev = delta_cid
+        if pointer['head'] != prev:
+            raise ValueError(f"Pointer {pointer_cid} head {pointer['head']} does not match chain end {prev}")
+
+        by_cid = {}
+        for rec in records:
+            rec = dict(rec)
+            by_cid[rec.pop('cid')] = rec
+        if len(by_cid) != pointer['count']:
+            raise ValueError(f"Pointer {pointer_cid} claims {pointer['count']} records, chain has {len(by_cid)}")
+        new = self._remember(by_cid, pointer_cid if trusted_signers is not None else None)
+        return [by_cid[cid] for cid in new]
@@ -0,0 +1,126 @@
+"""
+Round-trip checks for the QGP multi-file archive format.
+"""
+import os
+import pytest
+from nacl.exceptions import CryptoError
+from nacl.public import PrivateKey
+from qgp.archive import Archive
+from qgp.postquantum import generate_pq_keypair
+
+
+@pytest.fixture
+def keys():
+    sender = PrivateKey.generate()
+    receiver = PrivateKey.generate()
+    pq_sk, pq_pk = generate_pq_keypair()
+    return sender, receiver, pq_sk, pq_pk
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_bytes(b"alpha")
+    (src / "sub" / "b.bin").write_bytes(os.urandom(4096))
+    (tmp_path / "c.txt").write_bytes(b"charlie")
+    return tmp_path
+
+
+def pack(keys, sources, out_path):
+    sender, receiver, _, pq_pk = keys
+    return Archive.pack(sender, receiver.public_key, pq_pk, sources, str(out_path),
+                        recipient_id=b"r" * 8, workers=2)
+
+
+def open_archive(keys, out_path):
+    sender, receiver, pq_sk, _ = keys
+    return Archive.open(receiver, sender.public_key, pq_sk, str(out_path))
+
+
+def test_round_trip(keys, tree):
+    out = tree / "t.qgpa"
+    assert pack(keys, [tree / "src", tree / "c.txt"], out) == 3
+
+    header = Archive.read_header(str(out))
+    assert header['recipient_id'] == b"r" * 8
+    assert header['sender_id'] is None
+
+    reader = open_archive(keys, out)
+    assert reader.names() == ["c.txt", "src/a.txt", "src/sub/b.bin"]
+    assert reader.extract(str(tree / "dst")) == 3
+    for name in reader.names():
+        original = tree / name
+        assert (tree / "dst" / name).read_bytes() == original.read_bytes()
+
+
+def test_single_entry(keys, tree):
+    out = tree / "t.qgpa"
+    pack(keys, [tree / "src"], out)
+    reader = open_archive(keys, out)
+    assert reader.read("src/a.txt") == b"alpha"
+    assert reader.extract(str(tree / "one"), names=["src/sub/b.bin"]) == 1
+    assert os.listdir(tree / "one" / "src") == ["sub"]
+    with pytest.raises(KeyError):
+        reader.read("missing.txt")
+
+
+def test_duplicate_names(keys, tmp_path):
+    for d in ("a", "b"):
+        (tmp_path / d).mkdir()
+        (tmp_path / d / "x.txt").write_bytes(d.encode())
+    (tmp_path / "x.txt").write_bytes(b"top")
+    out = tmp_path / "t.qgpa"
+    # Directory entries are prefixed, so these do not collide
+    assert pack(keys, [tmp_path / "a", tmp_path / "b", tmp_path / "x.txt"], out) == 3
+    # The same file twice does
+    with pytest.raises(ValueError):
+        pack(keys, [tmp_path / "x.txt", tmp_path / "a" / "x.txt"], tmp_path / "dup.qgpa")
+    assert not (tmp_path / "dup.qgpa").exists()
+
+
+def test_missing_source(keys, tree):
+    out = tree / "t.qgpa"
+    with pytest.raises(FileNotFoundError):
+        pack(keys, [tree / "src", tree / "nope"], out)
+    assert not out.exists()
+
+
+def test_excludes_output(keys, tree):
+    out = tree / "src" / "t.qgpa"
+    out.write_bytes(b"stale")
+    assert pack(keys, [tree / "src"], out) == 2
+    assert "src/t.qgpa" not in open_archive(keys, out).names()
+
+
+def test_tampered_blob(keys, tree):
+    out = tree / "t.qgpa"
+    pack(keys, [tree / "src"], out)
+    entry = open_archive(keys, out).files[0]
+    data = bytearray(out.read_bytes())
+    data[entry['offset'] + entry['length'] - 1] ^= 0x01
+    out.write_bytes(bytes(data))
+    reader = open_archive(keys, out)
+    with pytest.raises(CryptoError):
+        reader.read(entry['name'])
+
+
+def test_output_is_source(keys, tree):
+    src = tree / "c.txt"
+    with pytest.raises(ValueError):
+        pack(keys, [src], src)
+    assert src.read_bytes() == b"charlie"
+
+
+def test_root_rejected(keys, tree):
+    with pytest.raises(ValueError):
+        pack(keys, [os.path.abspath(os.sep)], tree / "t.qgpa")
+    assert not (tree / "t.qgpa").exists()
+
+
+def test_not_an_archive(tree):
+    with pytest.raises(ValueError):
+        Archive.read_header(str(tree / "c.txt"))
+    (tree / "short").write_bytes(b"QGPA\x01")
+    with pytest.raises(ValueError):
+        Archive.read_header(str(tree / "short"))
@@ -0,0 +1,26 @@
+"""
+Checks for the KeyManager key ID -> label index.
+"""
+import shutil
+from qgp.keys import KeyManager
+
+
+def test_find_label_prefers_private_identity(tmp_path):
+    km = KeyManager(key_dir=str(tmp_path))
+    km.generate_keypair("zed")
+    # Public-only copy of the same key under a label that sorts first
+    for kind in ("ecc", "pq"):
+        shutil.copy(tmp_path / f"zed_{kind}.pk", tmp_path / f"alpha_{kind}.pk")
+    kid = km.key_id("zed")
+
+    assert km.build_key_index()[kid] == ["alpha", "zed"]
+    assert km.find_label(kid) == "alpha"
+    assert km.find_label(kid, private=True) == "zed"
+    assert km.find_label(b"\0" * len(kid)) is None
+
+
+def test_generate_updates_built_index(tmp_path):
+    km = KeyManager(key_dir=str(tmp_path))
+    km.build_key_index()
+    km.generate_keypair("new")
+    assert km.find_label(km.key_id("new"), private=True) == "new"